@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -8,6 +10,19 @@ class Settings(BaseSettings):
     
     ENSEMBL_API_SERVER: str = "https://rest.ensembl.org"
     REACTOME_API_SERVER: str = "https://reactome.org/ContentService"
+    VEP_BATCH_SIZE: int = 200
+
+    CACHE_MAXSIZE: int = 10_000
+    CACHE_TTL_SECONDS: int = 86_400
+    VEP_NEGATIVE_CACHE_TTL_SECONDS: int = 300
+
+    # Optional Redis cache of full /variant/context responses; disabled when unset.
+    REDIS_URL: Optional[str] = None
+    RESPONSE_CACHE_TTL_SECONDS: int = 86_400
+    REDIS_TIMEOUT_SECONDS: float = 0.5
+
+    # Token required in the X-Admin-Token header for admin endpoints; they are disabled when unset.
+    ADMIN_TOKEN: Optional[str] = None
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -15,4 +30,9 @@ class Settings(BaseSettings):
         case_sensitive=False
     )
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the process-wide Settings instance; call get_settings.cache_clear() to reload it."""
+    return Settings()
+
+settings = get_settings()
@@ -1,18 +1,151 @@
+import asyncio
+import contextvars
 import httpx
 import logging
-from typing import Optional, List, Dict, Any
+import orjson
+import time
+from async_lru import alru_cache
+from typing import Optional, List, Dict, Any, Set
 
 from .core.config import settings
 
 log = logging.getLogger("app.external_apis")
 
-async def get_vep_annotation_via_api(vep_api_input_id: str) -> Optional[Dict[str, Any]]:
+# Shared client so repeated calls reuse pooled keep-alive connections instead of
+# paying a fresh TCP+TLS handshake per request. Opened/closed by the app lifespan.
+_client: Optional[httpx.AsyncClient] = None
+
+def _get_client() -> httpx.AsyncClient:
+    """Returns the shared HTTP client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _client
+
+async def open_http_client() -> None:
+    """Initializes the shared HTTP client. Called on application startup."""
+    _get_client()
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client and its connection pool. Called on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+# Identifiers VEP rejected with a client error (e.g. 400 for malformed HGVS), mapped to
+# the monotonic time at which the rejection expires. Kept separate from the main cache
+# so these are retried sooner, while still sparing Ensembl a burst of repeated 400s.
+_vep_rejections: Dict[str, float] = {}
+
+def _is_recently_rejected(vep_api_input_id: str) -> bool:
+    """Returns True if VEP rejected this identifier within the negative-cache TTL."""
+    expires_at = _vep_rejections.get(vep_api_input_id)
+    if expires_at is None:
+        return False
+    if expires_at > time.monotonic():
+        return True
+    del _vep_rejections[vep_api_input_id]
+    return False
+
+def _is_rejection(status_code: int) -> bool:
+    """Client errors are a property of the identifier; rate limits and server errors are transient."""
+    return 400 <= status_code < 500 and status_code != 429
+
+def _remember_rejection(vep_api_input_id: str) -> None:
+    """Records a VEP client-error response, evicting the oldest entry when full."""
+    if len(_vep_rejections) >= settings.CACHE_MAXSIZE:
+        _vep_rejections.pop(next(iter(_vep_rejections)))
+    _vep_rejections[vep_api_input_id] = time.monotonic() + settings.VEP_NEGATIVE_CACHE_TTL_SECONDS
+
+class _VepBatchError(Exception):
+    """A VEP batch call failed as a whole; it says nothing about any single identifier."""
+
+class _VepBatchLoader:
     """
-    Fetches variant annotations from the Ensembl VEP REST API, including AlphaMissense scores.
+    Collects the VEP cache misses of one batch request and resolves them with POST
+    calls of up to VEP_BATCH_SIZE identifiers, instead of one GET per identifier.
     """
-    if not vep_api_input_id:
-        return None
+    def __init__(self) -> None:
+        self._pending: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    def load(self, vep_api_input_id: str) -> "asyncio.Future[Optional[Dict[str, Any]]]":
+        """Queues an identifier for the next POST and returns a future for its annotation."""
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            # Misses requested in the same event-loop iteration are sent together.
+            loop.call_soon(self._dispatch)
+        future = self._pending.get(vep_api_input_id)
+        if future is None:
+            future = self._pending[vep_api_input_id] = loop.create_future()
+        return future
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        ids = list(pending)
+        size = settings.VEP_BATCH_SIZE
+        for i in range(0, len(ids), size):
+            task = asyncio.create_task(self._resolve({id: pending[id] for id in ids[i:i + size]}))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _annotate(self, vep_api_input_ids: List[str]) -> Dict[str, Any]:
+        """
+        POSTs the identifiers and maps each to its annotation or, once isolated, to the
+        client error VEP returned for it alone. VEP rejects a whole batch with a 4xx if
+        any identifier in it is bad, so a rejected batch is split in half and retried.
+        """
+        try:
+            return await _post_vep_batch(vep_api_input_ids)
+        except httpx.HTTPStatusError as e:
+            if not _is_rejection(e.response.status_code):
+                raise
+            if len(vep_api_input_ids) == 1:
+                return {vep_api_input_ids[0]: e}
+
+        log.warning("VEP API rejected a batch of %d identifiers; splitting it.", len(vep_api_input_ids))
+        half = len(vep_api_input_ids) // 2
+        left, right = await asyncio.gather(self._annotate(vep_api_input_ids[:half]), self._annotate(vep_api_input_ids[half:]))
+        return {**left, **right}
 
+    async def _resolve(self, futures: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"]) -> None:
+        results: Dict[str, Any] = {}
+        try:
+            results.update(await self._annotate(list(futures)))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Only an explicit answer from VEP may be cached, so identifiers the batch left
+        # out are looked up on their own rather than taken as not found.
+        missing = [i for i in futures if i not in results]
+        if missing:
+            log.info("VEP API batch omitted %d identifiers; querying them individually.", len(missing))
+            fetched = await asyncio.gather(*(_request_vep_annotation(i) for i in missing), return_exceptions=True)
+            results.update(zip(missing, fetched))
+
+        for vep_api_input_id, future in futures.items():
+            if future.done():
+                continue
+            result = results[vep_api_input_id]
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+# Set while a batch request is fetching, so cache misses inside it are POSTed by the
+# batch's loader rather than fetched one GET at a time.
+_vep_batch_loader: contextvars.ContextVar[Optional[_VepBatchLoader]] = contextvars.ContextVar("vep_batch_loader", default=None)
+
+async def _request_vep_annotation(vep_api_input_id: str) -> Optional[Dict[str, Any]]:
+    """Sends one uncached GET to VEP. HTTP and network errors propagate to the caller."""
     endpoint = f"/vep/human/hgvs/{vep_api_input_id}"
     params = {
         "content-type": "application/json",
@@ -20,56 +153,169 @@ async def get_vep_annotation_via_api(vep_api_input_id: str) -> Optional[Dict[str
         "AlphaMissense": "1" 
     }
     url = f"{settings.ENSEMBL_API_SERVER}{endpoint}"
-    log.info(f"Querying VEP API for: {vep_api_input_id}")
+    log.info("Querying VEP API for: %s", vep_api_input_id)
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers={"Content-Type": "application/json"}, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-
-        if data and isinstance(data, list) and len(data) > 0:
-            log.info(f"Successfully fetched VEP annotation for {vep_api_input_id}.")
-            return data[0]
-        
-        log.warning(f"VEP API returned an empty list for {vep_api_input_id}")
+    response = await _get_client().get(url, headers={"Content-Type": "application/json"}, params=params, timeout=30)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+
+    if data and isinstance(data, list) and len(data) > 0:
+        log.info("Successfully fetched VEP annotation for %s.", vep_api_input_id)
+        return data[0]
+
+    log.warning("VEP API returned an empty list for %s", vep_api_input_id)
+    return None
+
+@alru_cache(maxsize=settings.CACHE_MAXSIZE, ttl=settings.CACHE_TTL_SECONDS)
+async def _fetch_vep_annotation(vep_api_input_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Cached VEP request. HTTP and network errors propagate so they are never cached;
+    an empty result is a definitive answer and is cached like any other. Inside a
+    batch request, misses are fetched through the batch's POST loader.
+    """
+    loader = _vep_batch_loader.get()
+    if loader is not None:
+        return await loader.load(vep_api_input_id)
+    return await _request_vep_annotation(vep_api_input_id)
+
+async def get_vep_annotation_via_api(vep_api_input_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetches variant annotations from the Ensembl VEP REST API, including AlphaMissense scores.
+    """
+    if not vep_api_input_id:
         return None
 
+    if _is_recently_rejected(vep_api_input_id):
+        log.info("Skipping VEP API for %s: rejected by VEP recently.", vep_api_input_id)
+        return None
+
+    try:
+        return await _fetch_vep_annotation(vep_api_input_id)
+
     except httpx.HTTPStatusError as e:
-        log.error(f"HTTP error calling VEP API for '{vep_api_input_id}': {e.response.status_code} - {e.response.text}")
+        log.error("HTTP error calling VEP API for '%s': %d - %s", vep_api_input_id, e.response.status_code, e.response.text)
+        if _is_rejection(e.response.status_code):
+            _remember_rejection(vep_api_input_id)
         return None
     except httpx.RequestError as e:
-        log.error(f"Network error calling VEP API for '{vep_api_input_id}': {e}")
+        log.error("Network error calling VEP API for '%s': %s", vep_api_input_id, e)
+        return None
+    except _VepBatchError as e:
+        # Joined a concurrent batch request's lookup for this identifier, and that batch failed.
+        log.error("VEP API batch failed while fetching '%s': %s", vep_api_input_id, e)
         return None
 
-async def get_reactome_pathways_via_api(ensembl_gene_id: str) -> List[str]:
+async def _post_vep_batch(vep_api_input_ids: List[str]) -> Dict[str, Dict[str, Any]]:
     """
-    Fetches associated pathways for a given Ensembl Gene ID from the Reactome API.
+    Sends one POST batch to VEP and maps each returned annotation by its input identifier.
+    HTTP and network errors propagate to the caller; a malformed payload raises _VepBatchError.
+    """
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs"
+    params = {"hgvs": "1", "AlphaMissense": "1"}
+    headers = {"Content-Type": "application/json", "Accept": "application/json"}
+    log.info("Querying VEP API batch of %d identifiers.", len(vep_api_input_ids))
+
+    response = await _get_client().post(
+        url, headers=headers, params=params,
+        content=orjson.dumps({"hgvs_notations": vep_api_input_ids}), timeout=60
+    )
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+
+    if not isinstance(data, list):
+        raise _VepBatchError("VEP API batch returned an unexpected payload.")
+
+    annotations: Dict[str, Dict[str, Any]] = {}
+    for annotation in data:
+        # VEP may return several entries per input; keep the first, as the GET lookup does.
+        if annotation and "input" in annotation:
+            annotations.setdefault(annotation["input"], annotation)
+    return annotations
+
+async def get_vep_annotations_batch_via_api(vep_api_input_ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Fetches VEP annotations for many identifiers. Identifiers already cached, or
+    recently rejected by VEP, are served from the in-process caches; the rest are
+    sent through the POST endpoint in calls of up to VEP_BATCH_SIZE. Identifiers VEP
+    could not annotate, or rejected, are absent from the returned mapping. Returns None
+    if a VEP call failed for other reasons, so a service failure is not mistaken for
+    variants without annotations.
+    """
+    unique_ids = [i for i in dict.fromkeys(vep_api_input_ids) if i and not _is_recently_rejected(i)]
+    if not unique_ids:
+        return {}
+
+    token = _vep_batch_loader.set(_VepBatchLoader())
+    try:
+        results = await asyncio.gather(*(_fetch_vep_annotation(i) for i in unique_ids), return_exceptions=True)
+    finally:
+        _vep_batch_loader.reset(token)
+
+    annotations: Dict[str, Dict[str, Any]] = {}
+    for vep_api_input_id, result in zip(unique_ids, results):
+        # The loader only reports a client error once it is isolated to one identifier,
+        # so that identifier is dropped and remembered, as in the GET lookup.
+        if isinstance(result, httpx.HTTPStatusError) and _is_rejection(result.response.status_code):
+            _remember_rejection(vep_api_input_id)
+            continue
+        if isinstance(result, httpx.HTTPStatusError):
+            log.error("HTTP error calling VEP API batch: %d - %s", result.response.status_code, result.response.text)
+            return None
+        if isinstance(result, httpx.RequestError):
+            log.error("Network error calling VEP API batch: %s", result)
+            return None
+        if isinstance(result, _VepBatchError):
+            log.error("%s", result)
+            return None
+        if isinstance(result, BaseException):
+            raise result
+        if result:
+            annotations[vep_api_input_id] = result
+    log.info("Fetched VEP annotations for %d of %d identifiers.", len(annotations), len(unique_ids))
+    return annotations
+
+@alru_cache(maxsize=settings.CACHE_MAXSIZE, ttl=settings.CACHE_TTL_SECONDS)
+async def _fetch_reactome_pathways(ensembl_gene_id: str) -> List[str]:
+    """
+    Cached Reactome request. A 404 means the gene has no pathways and is cached as
+    an empty list; other HTTP and network errors propagate and are not cached.
     """
-    if not ensembl_gene_id:
-        return []
-    
     endpoint = f"/data/mapping/ENSEMBL/{ensembl_gene_id}/pathways"
     url = f"{settings.REACTOME_API_SERVER}{endpoint}"
     headers = {'accept': 'application/json'}
-    log.info(f"Querying Reactome API for gene: {ensembl_gene_id}")
+    log.info("Querying Reactome API for gene: %s", ensembl_gene_id)
+
+    response = await _get_client().get(url, headers=headers, timeout=15)
+    if response.status_code == 404:
+        log.info("No pathways found in Reactome for %s (404).", ensembl_gene_id)
+        return []
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+
+    pathway_ids = [pathway['stId'] for pathway in data if pathway and 'stId' in pathway]
+    log.info("Found %d pathways for %s.", len(pathway_ids), ensembl_gene_id)
+    return sorted(pathway_ids)
+
+async def get_reactome_pathways_via_api(ensembl_gene_id: str) -> Optional[List[str]]:
+    """
+    Fetches associated pathways for a given Ensembl Gene ID from the Reactome API.
+    Returns None if the lookup failed, as distinct from [] for a gene with no pathways.
+    """
+    if not ensembl_gene_id:
+        return []
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-        
-        pathway_ids = [pathway['stId'] for pathway in data if pathway and 'stId' in pathway]
-        log.info(f"Found {len(pathway_ids)} pathways for {ensembl_gene_id}.")
-        return sorted(pathway_ids)
+        return await _fetch_reactome_pathways(ensembl_gene_id)
 
     except httpx.HTTPStatusError as e:
-        if e.response.status_code == 404:
-            log.info(f"No pathways found in Reactome for {ensembl_gene_id} (404).")
-        else:
-            log.error(f"HTTP error calling Reactome API for '{ensembl_gene_id}': {e.response.status_code} - {e.response.text}")
-        return []
+        log.error("HTTP error calling Reactome API for '%s': %d - %s", ensembl_gene_id, e.response.status_code, e.response.text)
+        return None
     except httpx.RequestError as e:
-        log.error(f"Network error calling Reactome API for '{ensembl_gene_id}': {e}")
-        return []
+        log.error("Network error calling Reactome API for '%s': %s", ensembl_gene_id, e)
+        return None
+
+def clear_caches() -> None:
+    """Drops all cached VEP and Reactome responses."""
+    _fetch_vep_annotation.cache_clear()
+    _vep_rejections.clear()
+    _fetch_reactome_pathways.cache_clear()
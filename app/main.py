@@ -1,20 +1,56 @@
-from fastapi import FastAPI, Query, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Response, Header, Depends
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 
+import asyncio
 import logging
+import secrets
 
 from .core.config import settings
 from .variant_parser import normalize_variant_for_vep
-from .external_apis import get_vep_annotation_via_api, get_reactome_pathways_via_api
+from .external_apis import (
+    get_vep_annotation_via_api,
+    get_vep_annotations_batch_via_api,
+    get_reactome_pathways_via_api,
+    open_http_client,
+    close_http_client,
+    clear_caches,
+)
+from .response_cache import (
+    is_response_cache_enabled,
+    response_cache_key,
+    get_or_compute_response,
+    with_input_variant,
+    dump_response,
+    get_cached_responses,
+    store_responses,
+    open_response_cache,
+    close_response_cache,
+    clear_response_cache,
+)
 
 logging.basicConfig(level=settings.LOGGING_LEVEL.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 log = logging.getLogger("app.main")
 
+# Rank tables for consequence selection; higher severity / lower impact rank wins.
+SEVERITY_ORDER = {"likely_pathogenic": 3, "ambiguous": 2, "likely_benign": 1}
+IMPACT_ORDER = {"HIGH": 1, "MODERATE": 2, "LOW": 3, "MODIFIER": 4}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Opens the shared outbound HTTP client and response cache on startup and closes them on shutdown."""
+    await open_http_client()
+    await open_response_cache()
+    yield
+    await close_response_cache()
+    await close_http_client()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description=f"Provides functional context for genetic variants based on {settings.ASSEMBLY}.",
     version="2.2.0",
+    lifespan=lifespan,
 )
 
 class VariantContextResponse(BaseModel):
@@ -33,20 +69,40 @@ class VariantContextResponse(BaseModel):
     alphamissense_prediction: Optional[str] = Field(None, description="AlphaMissense classification")
     pathways: List[str] = Field([], description="List of associated Reactome pathway IDs")
 
-def _find_most_severe_alphamissense(vep_consequences: List[Dict[str, Any]]) -> Optional[Tuple[float, str]]:
+class VariantBatchRequest(BaseModel):
+    """Request body for annotating several variants in one call."""
+    variant_identifiers: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.VEP_BATCH_SIZE,
+        description=f"Variant identifiers assumed {settings.ASSEMBLY}",
+        examples=[["7:140753336:A:T", "rs113488022"]]
+    )
+    include_pathways: bool = Field(True, description="Look up associated Reactome pathways")
+
+def _summarize_consequences(vep_consequences: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Optional[Tuple[float, str]]]:
     """
-    Iterates through all transcript consequences to find the most severe AlphaMissense prediction.
+    Makes a single pass over all transcript consequences, selecting both the most relevant
+    consequence (highest impact, canonical first) and the most severe AlphaMissense prediction.
     """
-    SEVERITY_ORDER = { "likely_pathogenic": 3, "ambiguous": 2, "likely_benign": 1 }
-    
+    relevant_consequence = None
+    best_rank = None
+
     best_score = -1.0
     best_class = None
     best_severity = -1
     found_am = False
 
     for consequence in vep_consequences:
+        # Keep the first consequence with the lowest (impact, non-canonical) rank.
+        rank = (IMPACT_ORDER.get(consequence.get("impact", "MODIFIER"), 5), 0 if consequence.get("canonical") == 1 else 1)
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            relevant_consequence = consequence
+
         # Only consider missense variants for AlphaMissense scores.
-        if "missense_variant" not in consequence.get("consequence_terms", []):
+        terms = consequence.get("consequence_terms") or ()
+        if "missense_variant" not in terms:
             continue
 
         am_data = consequence.get("alphamissense")
@@ -66,62 +122,168 @@ def _find_most_severe_alphamissense(vep_consequences: List[Dict[str, Any]]) -> O
                     best_score = current_score
 
             except (ValueError, TypeError) as e:
-                log.error(f"Could not parse AlphaMissense data from VEP: '{am_data}' - {e}")
-    
-    if found_am:
-        return (best_score, best_class)
-    return None
-
-@app.get(
-    "/variant/context",
-    response_model=VariantContextResponse,
-    summary=f"Get Functional Context for a Variant ({settings.ASSEMBLY})",
-    tags=["Variant Annotation"]
-)
-async def get_variant_context_query(
-    variant_identifier: str = Query(..., description=f"Variant identifier assumed {settings.ASSEMBLY}", examples=["7:140753336:A:T", "rs113488022"])
-):
-    """Orchestrates the asynchronous annotation process for a given variant identifier."""
-    log.info(f"Processing request for variant: {variant_identifier}")
+                log.error("Could not parse AlphaMissense data from VEP: '%s' - %s", am_data, e)
 
-    vep_api_input_id = normalize_variant_for_vep(variant_identifier)
-    if not vep_api_input_id:
-        raise HTTPException(status_code=400, detail=f"Invalid or unparseable variant format: {variant_identifier}")
-
-    vep_response = await get_vep_annotation_via_api(vep_api_input_id)
-    if not vep_response:
-        raise HTTPException(status_code=404, detail=f"Could not find annotation for variant: {variant_identifier}")
+    am_result = (best_score, best_class) if found_am else None
+    return relevant_consequence, am_result
 
+async def _build_variant_context(variant_identifier: str, vep_response: Dict[str, Any], include_pathways: bool = True) -> Optional[Tuple[VariantContextResponse, bool]]:
+    """
+    Assembles the response for one VEP annotation, fetching its Reactome pathways
+    unless include_pathways is False. Returns (response, complete), where complete is
+    False if the Reactome lookup failed and pathways are missing rather than empty,
+    or None if VEP reported no transcript consequences.
+    """
     vep_consequences = vep_response.get("transcript_consequences")
     if not vep_consequences:
-        raise HTTPException(status_code=404, detail=f"No transcript consequences found for variant: {variant_identifier}")
+        return None
 
-    am_score, am_pred = None, None
-    am_result = _find_most_severe_alphamissense(vep_consequences)
-    if am_result:
-        am_score, am_pred = am_result
+    relevant_consequence, am_result = _summarize_consequences(vep_consequences)
+    am_score, am_pred = am_result if am_result else (None, None)
 
-    highest_impact_order = {"HIGH": 1, "MODERATE": 2, "LOW": 3, "MODIFIER": 4}
-    vep_consequences.sort(key=lambda x: (highest_impact_order.get(x.get("impact", "MODIFIER"), 5), 0 if x.get("canonical") == 1 else 1))
-    relevant_consequence = vep_consequences[0]
-    
     ensembl_gene_id = relevant_consequence.get("gene_id")
-    pathways = await get_reactome_pathways_via_api(ensembl_gene_id) if ensembl_gene_id else []
-    
+    pathways = await get_reactome_pathways_via_api(ensembl_gene_id) if include_pathways and ensembl_gene_id else []
+    complete = pathways is not None
+
     hgvsc_raw = relevant_consequence.get("hgvsc")
     hgvsp_raw = relevant_consequence.get("hgvsp")
 
-    return VariantContextResponse(
+    # Every field below is assembled here from parsed VEP/Reactome data, so skip
+    # pydantic's per-field validation; the untrusted request input is still validated.
+    context = VariantContextResponse.model_construct(
         input_variant=variant_identifier,
         resolved_variant=vep_response.get("input", variant_identifier),
         gene_symbol=relevant_consequence.get("gene_symbol"),
         ensembl_gene_id=ensembl_gene_id,
         transcript_id=relevant_consequence.get("transcript_id"),
-        consequence=",".join(relevant_consequence.get("consequence_terms", [])),
-        hgvsc=hgvsc_raw.split(':')[-1] if hgvsc_raw and ':' in hgvsc_raw else hgvsc_raw,
-        hgvsp=hgvsp_raw.split(':')[-1] if hgvsp_raw and ':' in hgvsp_raw else hgvsp_raw,
+        consequence=",".join(relevant_consequence.get("consequence_terms") or ()),
+        hgvsc=hgvsc_raw.rpartition(':')[2] if hgvsc_raw else hgvsc_raw,
+        hgvsp=hgvsp_raw.rpartition(':')[2] if hgvsp_raw else hgvsp_raw,
         impact=relevant_consequence.get("impact"),
         alphamissense_score=am_score,
         alphamissense_prediction=am_pred,
-        pathways=pathways
+        pathways=pathways if complete else []
     )
+    return context, complete
+
+async def _resolve_variant_context(variant_identifier: str, vep_api_input_id: str, include_pathways: bool) -> Tuple[VariantContextResponse, bool]:
+    """
+    Fetches and assembles the (response, complete) pair for a normalized identifier,
+    raising 404 if VEP has nothing for it.
+    """
+    vep_response = await get_vep_annotation_via_api(vep_api_input_id)
+    if not vep_response:
+        raise HTTPException(status_code=404, detail=f"Could not find annotation for variant: {variant_identifier}")
+
+    result = await _build_variant_context(variant_identifier, vep_response, include_pathways)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No transcript consequences found for variant: {variant_identifier}")
+    return result
+
+@app.get(
+    "/variant/context",
+    response_model=VariantContextResponse,
+    summary=f"Get Functional Context for a Variant ({settings.ASSEMBLY})",
+    tags=["Variant Annotation"]
+)
+async def get_variant_context_query(
+    variant_identifier: str = Query(..., description=f"Variant identifier assumed {settings.ASSEMBLY}", examples=["7:140753336:A:T", "rs113488022"]),
+    include_pathways: bool = Query(True, description="Look up associated Reactome pathways")
+):
+    """Orchestrates the asynchronous annotation process for a given variant identifier."""
+    log.info("Processing request for variant: %s", variant_identifier)
+
+    vep_api_input_id = normalize_variant_for_vep(variant_identifier)
+    if not vep_api_input_id:
+        raise HTTPException(status_code=400, detail=f"Invalid or unparseable variant format: {variant_identifier}")
+
+    if not is_response_cache_enabled():
+        context, _ = await _resolve_variant_context(variant_identifier, vep_api_input_id, include_pathways)
+        return context
+
+    payload = await get_or_compute_response(
+        response_cache_key(vep_api_input_id, include_pathways),
+        lambda: _resolve_variant_context(variant_identifier, vep_api_input_id, include_pathways)
+    )
+    return Response(content=with_input_variant(payload, variant_identifier), media_type="application/json")
+
+@app.post(
+    "/variant/context/batch",
+    response_model=List[VariantContextResponse],
+    summary=f"Get Functional Context for Multiple Variants ({settings.ASSEMBLY})",
+    tags=["Variant Annotation"]
+)
+async def get_variant_context_batch(request: VariantBatchRequest):
+    """
+    Annotates several variants, sending cache misses to VEP in POST round-trips rather
+    than one call per variant. Variants VEP could not annotate, or that have no
+    transcript consequences, are omitted from the result, as are identifiers VEP rejects;
+    a VEP service failure fails the whole request with 502.
+    """
+    log.info("Processing batch request for %d variants.", len(request.variant_identifiers))
+
+    vep_ids: Dict[str, str] = {}
+    for variant_identifier in request.variant_identifiers:
+        vep_api_input_id = normalize_variant_for_vep(variant_identifier)
+        if not vep_api_input_id:
+            raise HTTPException(status_code=400, detail=f"Invalid or unparseable variant format: {variant_identifier}")
+        vep_ids[variant_identifier] = vep_api_input_id
+
+    # Read once: the cache can be closed mid-request on shutdown.
+    use_cache = is_response_cache_enabled()
+    cached: Dict[str, bytes] = {}
+    keys: Dict[str, str] = {}
+    if use_cache:
+        keys = {vep_api_input_id: response_cache_key(vep_api_input_id, request.include_pathways) for vep_api_input_id in vep_ids.values()}
+        payloads = await get_cached_responses(list(keys.values()))
+        cached = {vep_api_input_id: payload for vep_api_input_id, payload in zip(keys, payloads) if payload is not None}
+
+    vep_responses = await get_vep_annotations_batch_via_api([i for i in vep_ids.values() if i not in cached])
+    if vep_responses is None:
+        raise HTTPException(status_code=502, detail="VEP annotation service failed for the batch request.")
+
+    pending = [(variant_identifier, vep_api_input_id) for variant_identifier, vep_api_input_id in vep_ids.items()
+               if vep_api_input_id not in cached and vep_api_input_id in vep_responses]
+    results = await asyncio.gather(*(
+        _build_variant_context(variant_identifier, vep_responses[vep_api_input_id], request.include_pathways)
+        for variant_identifier, vep_api_input_id in pending
+    ))
+
+    if not use_cache:
+        return [context for context, _ in filter(None, results)]
+
+    fresh: Dict[str, bytes] = {}
+    for (_, vep_api_input_id), result in zip(pending, results):
+        if result is not None:
+            context, complete = result
+            cached[vep_api_input_id] = dump_response(context)
+            if complete:
+                fresh[keys[vep_api_input_id]] = cached[vep_api_input_id]
+    await store_responses(fresh)
+
+    items = [with_input_variant(cached[vep_api_input_id], variant_identifier)
+             for variant_identifier, vep_api_input_id in vep_ids.items() if vep_api_input_id in cached]
+    return Response(content=b"[" + b",".join(items) + b"]", media_type="application/json")
+
+async def _require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Guards admin endpoints: they are hidden (404) unless ADMIN_TOKEN is configured,
+    and require a matching X-Admin-Token header.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post(
+    "/cache/clear",
+    summary="Clear Cached Annotations",
+    tags=["Admin"],
+    dependencies=[Depends(_require_admin_token)]
+)
+async def clear_annotation_cache() -> Dict[str, str]:
+    """Drops all cached VEP, Reactome and full responses so subsequent requests are re-fetched."""
+    clear_caches()
+    await clear_response_cache()
+    log.info("Cleared VEP, Reactome and response caches.")
+    return {"status": "cleared"}
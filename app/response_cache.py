@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from .core.config import settings
+
+log = logging.getLogger("app.response_cache")
+
+KEY_PREFIX = "vc"
+
+# Keys removed per UNLINK when clearing the cache.
+_CLEAR_CHUNK_SIZE = 500
+
+# Entries are keyed on the normalized identifier, so the caller's own spelling of the
+# variant is left out of the stored payload and spliced back in per request.
+_PER_REQUEST_FIELD = "input_variant"
+
+# Shared Redis client; stays None when REDIS_URL is unset, which disables the cache.
+_redis: Optional[redis.Redis] = None
+
+class _KeyLock:
+    """A lock plus a count of the requests holding or waiting on it."""
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+# Per-key locks so that, within a worker, only one request rebuilds an expired entry
+# while the others wait and then read the freshly stored value. An entry is dropped
+# only once no request holds or waits on it.
+_locks: Dict[str, _KeyLock] = {}
+
+def is_response_cache_enabled() -> bool:
+    """Returns True if a Redis response cache is configured and open."""
+    return _redis is not None
+
+async def open_response_cache() -> None:
+    """Connects to Redis if REDIS_URL is configured. Called on application startup."""
+    global _redis
+    if settings.REDIS_URL and _redis is None:
+        # Short socket timeouts so a hung Redis degrades to cache misses instead of stalling requests.
+        _redis = redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.REDIS_TIMEOUT_SECONDS,
+        )
+        log.info("Response cache enabled.")
+
+async def close_response_cache() -> None:
+    """Closes the Redis connection pool. Called on application shutdown."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+def response_cache_key(vep_api_input_id: str, include_pathways: bool) -> str:
+    """Builds the cache key for a normalized identifier; responses only vary by assembly and options."""
+    return f"{KEY_PREFIX}:{settings.ASSEMBLY}:{int(include_pathways)}:{vep_api_input_id}"
+
+async def _get(key: str) -> Optional[bytes]:
+    if _redis is None:
+        return None
+    try:
+        return await _redis.get(key)
+    except redis.RedisError as e:
+        log.warning("Response cache read failed for '%s': %s", key, e)
+        return None
+
+async def _set(key: str, payload: bytes) -> None:
+    if _redis is None:
+        return
+    try:
+        await _redis.set(key, payload, ex=settings.RESPONSE_CACHE_TTL_SECONDS)
+    except redis.RedisError as e:
+        log.warning("Response cache write failed for '%s': %s", key, e)
+
+def dump_response(response: BaseModel) -> bytes:
+    """Serializes a response for caching, without the per-request input_variant field."""
+    return response.model_dump_json(exclude={_PER_REQUEST_FIELD}).encode()
+
+def with_input_variant(payload: bytes, variant_identifier: str) -> bytes:
+    """Splices input_variant back in as the first field of a cached payload, without re-parsing it."""
+    return b'{"' + _PER_REQUEST_FIELD.encode() + b'":' + orjson.dumps(variant_identifier) + b"," + payload[1:]
+
+async def get_or_compute_response(key: str, compute: Callable[[], Awaitable[Tuple[BaseModel, bool]]]) -> bytes:
+    """
+    Returns the cached payload for key, or awaits compute() for a (response, complete)
+    pair and returns its payload, storing it only if complete is True so responses
+    degraded by a transient upstream failure are never cached. Payloads come from
+    dump_response; pass them through with_input_variant. Redis errors are logged and
+    treated as a miss; exceptions raised by compute() propagate and nothing is cached.
+    """
+    cached = await _get(key)
+    if cached is not None:
+        return cached
+
+    entry = _locks.setdefault(key, _KeyLock())
+    entry.users += 1
+    try:
+        async with entry.lock:
+            # Another request may have filled the entry while we waited for the lock.
+            cached = await _get(key)
+            if cached is not None:
+                return cached
+
+            response, complete = await compute()
+            payload = dump_response(response)
+            if complete:
+                await _set(key, payload)
+            return payload
+    finally:
+        entry.users -= 1
+        if entry.users == 0:
+            _locks.pop(key, None)
+
+async def get_cached_responses(keys: List[str]) -> List[Optional[bytes]]:
+    """
+    Returns the cached payload, or None on a miss, for each key in one round-trip.
+    Redis errors, or a cache closed mid-request, are read as misses.
+    """
+    if not keys or _redis is None:
+        return [None] * len(keys)
+    try:
+        return await _redis.mget(keys)
+    except redis.RedisError as e:
+        log.warning("Response cache read failed for %d keys: %s", len(keys), e)
+        return [None] * len(keys)
+
+async def store_responses(payloads: Dict[str, bytes]) -> None:
+    """Stores dump_response payloads by key; pass only complete responses."""
+    await asyncio.gather(*(_set(key, payload) for key, payload in payloads.items()))
+
+async def clear_response_cache() -> None:
+    """Deletes all cached responses."""
+    if _redis is None:
+        return
+    try:
+        # Unlink in bounded chunks while scanning, so neither this worker nor Redis
+        # handles the whole keyspace at once; UNLINK frees the values off the main thread.
+        keys = []
+        async for key in _redis.scan_iter(match=f"{KEY_PREFIX}:*", count=_CLEAR_CHUNK_SIZE):
+            keys.append(key)
+            if len(keys) >= _CLEAR_CHUNK_SIZE:
+                await _redis.unlink(*keys)
+                keys.clear()
+        if keys:
+            await _redis.unlink(*keys)
+    except redis.RedisError as e:
+        log.warning("Response cache clear failed: %s", e)
@@ -1,40 +1,47 @@
 import logging
+import re
+from functools import lru_cache
 from typing import Optional
 
 log = logging.getLogger("app.variant_parser")
 
+# One pass over the identifier; each alternative captures into its own groups:
+#   rsID              rs113488022
+#   CHR:POS:REF:ALT   7:140753336:A:T   (optional "chr" prefix, whitespace around ':')
+#   CHR:POSREF>ALT    12:25245350C>T    (optional "chr" prefix, whitespace around alleles)
+# Alleles must be nucleotides (A, C, G, T or N, in either case).
+_VARIANT_RE = re.compile(
+    r"^(?P<rsid>rs\d+)$"
+    r"|^(?:chr)?(?P<chrom>[^:\s]+)\s*:\s*(?P<pos>\d+)\s*:\s*(?P<ref>[ACGTN]+)\s*:\s*(?P<alt>[ACGTN]+)$"
+    r"|^(?:chr)?(?P<chrom_s>[^:\s]+)\s*:\s*(?P<pos_s>\d+)\s*(?P<ref_s>[ACGTN]+)\s*>\s*(?P<alt_s>[ACGTN]+)$",
+    re.IGNORECASE | re.ASCII,
+)
+
+# Full HGVS notation (e.g. NM_004333.6:c.1799T>A) is passed through to VEP as-is.
+_HGVS_RE = re.compile(r":[gcpn]\.", re.ASCII)
+
+@lru_cache(maxsize=10_000)
 def normalize_variant_for_vep(id_str: str) -> Optional[str]:
     """
     Validates and normalizes a user-provided variant identifier into a format
     suitable for the Ensembl VEP API. It leaves coordinate extraction to VEP.
+    Results are memoized, so repeated identifiers skip parsing (and its logging).
     """
-    log.info(f"Normalizing identifier for VEP: {id_str}")
+    log.info("Normalizing identifier for VEP: %s", id_str)
     cleaned_id = id_str.strip()
 
-    if cleaned_id.lower().startswith("rs") and cleaned_id[2:].isdigit():
-        return cleaned_id
-
-    try:
-        if cleaned_id.count(':') == 3: # Handles CHR:POS:REF:ALT
-            chrom, pos_str, ref, alt = [part.strip() for part in cleaned_id.split(':')]
-            if not pos_str.isdigit(): raise ValueError("Position is not a number.")
-            chrom_norm = chrom.replace('chr', '', 1).replace('Chr', '', 1)
-            return f"{chrom_norm}:g.{pos_str}{ref.upper()}>{alt.upper()}"
-        
-        if '>' in cleaned_id and cleaned_id.count(':') == 1: # Handles CHR:POSREF>ALT
-            chrom_pos, alt = [part.strip() for part in cleaned_id.split('>', 1)]
-            chrom_val, pos_ref = chrom_pos.split(':', 1)
-            pos_str = "".join(filter(str.isdigit, pos_ref))
-            ref = "".join(filter(str.isalpha, pos_ref)).upper()
-            if not pos_str or not ref: raise ValueError("Could not parse POSREF.")
-            chrom_norm = chrom_val.replace('chr', '', 1).replace('Chr', '', 1)
-            return f"{chrom_norm}:g.{pos_str}{ref}>{alt.upper()}"
+    match = _VARIANT_RE.match(cleaned_id)
+    if match:
+        if match.group("rsid"):
+            return cleaned_id
+        if match.group("chrom"):
+            chrom, pos_str, ref, alt = match.group("chrom", "pos", "ref", "alt")
+        else:
+            chrom, pos_str, ref, alt = match.group("chrom_s", "pos_s", "ref_s", "alt_s")
+        return f"{chrom}:g.{pos_str}{ref.upper()}>{alt.upper()}"
 
-    except (ValueError, IndexError):
-        log.warning(f"Could not parse '{cleaned_id}' as a simple coordinate format.")
-    
-    if ':' in cleaned_id and any(prefix in cleaned_id for prefix in ['g.', 'c.', 'p.', 'n.']):
+    if _HGVS_RE.search(cleaned_id):
         return cleaned_id
 
-    log.error(f"Unrecognized variant format: {cleaned_id}")
+    log.error("Unrecognized variant format: %s", cleaned_id)
     return None
@@ -9,6 +9,7 @@ from typing import AsyncGenerator
 
 # Import the main FastAPI app from your application.
 from app.main import app
+from app.external_apis import clear_caches
 
 @pytest.fixture(scope="session")
 def test_client() -> TestClient:
@@ -26,3 +27,42 @@ async def async_test_client() -> AsyncGenerator[AsyncClient, None]:
     # The client is initialized with the transport and a base_url.
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         yield client
+
+# VEP and Reactome responses are cached in-process, so each test starts from empty
+# caches to keep results independent of test order and to let requests reach mocks.
+@pytest.fixture(autouse=True)
+def _clear_api_caches():
+    clear_caches()
+    yield
+    clear_caches()
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the redis.asyncio client methods the response cache uses."""
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def scan_iter(self, match=None, count=None):
+        prefix = match.rstrip("*") if match else ""
+        for key in list(self.store):
+            if key.startswith(prefix):
+                yield key
+
+    async def unlink(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+@pytest.fixture
+def fake_redis(mocker) -> FakeRedis:
+    """Enables the response cache against an in-memory FakeRedis for one test."""
+    client = FakeRedis()
+    mocker.patch("app.response_cache._redis", client)
+    return client
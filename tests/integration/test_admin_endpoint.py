@@ -0,0 +1,48 @@
+# tests/integration/test_admin_endpoint.py
+
+import pytest
+import httpx
+
+from app.core.config import settings
+
+@pytest.mark.asyncio
+async def test_cache_clear_disabled_without_token(async_test_client: httpx.AsyncClient, mocker):
+    """
+    Tests that the admin endpoint is not reachable when no ADMIN_TOKEN is configured.
+    """
+    mocker.patch.object(settings, "ADMIN_TOKEN", None)
+    mock_clear = mocker.patch("app.main.clear_caches")
+
+    response = await async_test_client.post("/cache/clear", headers={"X-Admin-Token": "anything"})
+
+    assert response.status_code == 404
+    mock_clear.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_cache_clear_rejects_wrong_token(async_test_client: httpx.AsyncClient, mocker):
+    """
+    Tests that a missing or mismatched X-Admin-Token header is rejected.
+    """
+    mocker.patch.object(settings, "ADMIN_TOKEN", "s3cret")
+    mock_clear = mocker.patch("app.main.clear_caches")
+
+    missing = await async_test_client.post("/cache/clear")
+    wrong = await async_test_client.post("/cache/clear", headers={"X-Admin-Token": "guess"})
+
+    assert missing.status_code == 403
+    assert wrong.status_code == 403
+    mock_clear.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_cache_clear_with_token(async_test_client: httpx.AsyncClient, mocker):
+    """
+    Tests that the caches are cleared when the configured token is presented.
+    """
+    mocker.patch.object(settings, "ADMIN_TOKEN", "s3cret")
+    mock_clear = mocker.patch("app.main.clear_caches")
+
+    response = await async_test_client.post("/cache/clear", headers={"X-Admin-Token": "s3cret"})
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "cleared"}
+    mock_clear.assert_called_once()
@@ -0,0 +1,112 @@
+# tests/integration/test_batch_endpoint.py
+
+import json
+import pytest
+import httpx
+
+from app.core.config import settings
+
+VEP_BATCH_URL = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs"
+REACTOME_URL = f"{settings.REACTOME_API_SERVER}/data/mapping/ENSEMBL/ENSG00000157764/pathways"
+
+def _annotation(vep_input: str) -> dict:
+    return {
+        "input": vep_input,
+        "transcript_consequences": [{
+            "gene_id": "ENSG00000157764", "gene_symbol": "BRAF", "transcript_id": "ENST00000646891",
+            "impact": "MODERATE", "consequence_terms": ["missense_variant"], "canonical": 1,
+        }],
+    }
+
+@pytest.mark.asyncio
+async def test_batch_rejects_unparseable_identifier(async_test_client: httpx.AsyncClient, respx_mock):
+    """
+    Tests that one unparseable identifier fails the whole batch with 400 before VEP is called.
+    """
+    route = respx_mock.post(VEP_BATCH_URL)
+
+    response = await async_test_client.post("/variant/context/batch", json={"variant_identifiers": ["rs1", "not-a-variant"]})
+
+    assert response.status_code == 400
+    assert "not-a-variant" in response.json()["detail"]
+    assert route.call_count == 0
+
+@pytest.mark.asyncio
+async def test_batch_rejects_too_many_identifiers(async_test_client: httpx.AsyncClient):
+    """
+    Tests that a batch larger than VEP_BATCH_SIZE, or an empty one, fails validation.
+    """
+    too_many = [f"rs{i}" for i in range(settings.VEP_BATCH_SIZE + 1)]
+
+    oversized = await async_test_client.post("/variant/context/batch", json={"variant_identifiers": too_many})
+    empty = await async_test_client.post("/variant/context/batch", json={"variant_identifiers": []})
+
+    assert oversized.status_code == 422
+    assert empty.status_code == 422
+
+@pytest.mark.asyncio
+async def test_batch_omits_unannotated_variants(async_test_client: httpx.AsyncClient, respx_mock):
+    """
+    Tests that variants VEP did not annotate, or that have no transcript consequences,
+    are left out while the rest keep request order.
+    """
+    respx_mock.post(VEP_BATCH_URL).mock(return_value=httpx.Response(200, json=[
+        _annotation("rs3"), {"input": "rs2", "transcript_consequences": []}, _annotation("rs1"),
+    ]))
+    respx_mock.get(f"{VEP_BATCH_URL}/rs4").mock(return_value=httpx.Response(200, json=[]))
+    respx_mock.get(REACTOME_URL).mock(return_value=httpx.Response(200, json=[{"stId": "R-HSA-1"}]))
+
+    response = await async_test_client.post("/variant/context/batch", json={"variant_identifiers": ["rs1", "rs2", "rs3", "rs4"]})
+
+    assert response.status_code == 200
+    assert [item["input_variant"] for item in response.json()] == ["rs1", "rs3"]
+    assert response.json()[0]["pathways"] == ["R-HSA-1"]
+
+@pytest.mark.asyncio
+async def test_batch_without_pathways(async_test_client: httpx.AsyncClient, respx_mock):
+    """
+    Tests that include_pathways=false in the body skips the Reactome lookups.
+    """
+    respx_mock.post(VEP_BATCH_URL).mock(return_value=httpx.Response(200, json=[_annotation("rs1")]))
+    reactome_route = respx_mock.get(REACTOME_URL)
+
+    response = await async_test_client.post(
+        "/variant/context/batch", json={"variant_identifiers": ["rs1"], "include_pathways": False}
+    )
+
+    assert response.status_code == 200
+    assert response.json()[0]["pathways"] == []
+    assert reactome_route.call_count == 0
+
+@pytest.mark.asyncio
+async def test_batch_vep_failure(async_test_client: httpx.AsyncClient, respx_mock):
+    """
+    Tests that a VEP server error fails the batch with 502 rather than an empty list.
+    """
+    route = respx_mock.post(VEP_BATCH_URL).mock(return_value=httpx.Response(503, text="Service Unavailable"))
+
+    response = await async_test_client.post("/variant/context/batch", json={"variant_identifiers": ["rs1", "rs2"]})
+
+    assert response.status_code == 502
+    assert "VEP annotation service failed" in response.json()["detail"]
+    assert json.loads(route.calls[0].request.content)["hgvs_notations"] == ["rs1", "rs2"]
+
+@pytest.mark.asyncio
+async def test_batch_drops_identifier_vep_rejects(async_test_client: httpx.AsyncClient, respx_mock):
+    """
+    Tests that an identifier VEP rejects with a 400 is omitted instead of failing the batch with 502.
+    """
+    def reject_bad_id(request):
+        notations = json.loads(request.content)["hgvs_notations"]
+        if "1:g.5G>T" in notations:
+            return httpx.Response(400, json={"error": "Reference allele does not match"})
+        return httpx.Response(200, json=[_annotation(notation) for notation in notations])
+
+    respx_mock.post(VEP_BATCH_URL).mock(side_effect=reject_bad_id)
+
+    response = await async_test_client.post(
+        "/variant/context/batch", json={"variant_identifiers": ["rs1", "1:5:G:T"], "include_pathways": False}
+    )
+
+    assert response.status_code == 200
+    assert [item["input_variant"] for item in response.json()] == ["rs1"]
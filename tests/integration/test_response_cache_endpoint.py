@@ -0,0 +1,123 @@
+# tests/integration/test_response_cache_endpoint.py
+
+import json
+import pytest
+import httpx
+
+from app.core.config import settings
+from app.external_apis import clear_caches
+from app.response_cache import response_cache_key
+
+VEP_URL = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs/7:g.140753336A>T"
+REACTOME_URL = f"{settings.REACTOME_API_SERVER}/data/mapping/ENSEMBL/ENSG00000157764/pathways"
+CACHE_KEY = response_cache_key("7:g.140753336A>T", True)
+
+MOCK_VEP_RESPONSE = [{
+    "input": "7:g.140753336A>T",
+    "transcript_consequences": [{
+        "gene_id": "ENSG00000157764", "gene_symbol": "BRAF", "transcript_id": "ENST00000646891",
+        "impact": "MODERATE", "consequence_terms": ["missense_variant"], "canonical": 1,
+    }],
+}]
+
+@pytest.mark.asyncio
+async def test_cached_response_uses_callers_input_variant(async_test_client: httpx.AsyncClient, fake_redis, respx_mock):
+    """
+    Tests that a response cached under a normalized identifier echoes each caller's own spelling.
+    """
+    vep_route = respx_mock.get(VEP_URL).mock(return_value=httpx.Response(200, json=MOCK_VEP_RESPONSE))
+    respx_mock.get(REACTOME_URL).mock(return_value=httpx.Response(200, json=[{"stId": "R-HSA-1"}]))
+
+    first = await async_test_client.get("/variant/context", params={"variant_identifier": "7:140753336:A:T"})
+    clear_caches()
+    second = await async_test_client.get("/variant/context", params={"variant_identifier": "chr7:140753336:a:t"})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["input_variant"] == "7:140753336:A:T"
+    assert second.json()["input_variant"] == "chr7:140753336:a:t"
+    assert second.json()["pathways"] == ["R-HSA-1"]
+    assert vep_route.call_count == 1
+    assert CACHE_KEY in fake_redis.store
+
+@pytest.mark.asyncio
+async def test_not_found_is_not_cached(async_test_client: httpx.AsyncClient, fake_redis, respx_mock):
+    """
+    Tests that a 404 for a variant VEP cannot annotate leaves nothing in the response cache.
+    """
+    respx_mock.get(VEP_URL).mock(return_value=httpx.Response(200, json=[]))
+
+    response = await async_test_client.get("/variant/context", params={"variant_identifier": "7:140753336:A:T"})
+
+    assert response.status_code == 404
+    assert fake_redis.store == {}
+
+@pytest.mark.asyncio
+async def test_degraded_response_is_not_cached(async_test_client: httpx.AsyncClient, fake_redis, respx_mock):
+    """
+    Tests that a response missing pathways because Reactome failed is served but not
+    cached, so the next request retries Reactome and caches the full response.
+    """
+    respx_mock.get(VEP_URL).mock(return_value=httpx.Response(200, json=MOCK_VEP_RESPONSE))
+    respx_mock.get(REACTOME_URL).mock(side_effect=[
+        httpx.Response(503, text="Service Unavailable"),
+        httpx.Response(200, json=[{"stId": "R-HSA-1"}]),
+    ])
+
+    degraded = await async_test_client.get("/variant/context", params={"variant_identifier": "7:140753336:A:T"})
+
+    assert degraded.status_code == 200
+    assert degraded.json()["pathways"] == []
+    assert CACHE_KEY not in fake_redis.store
+
+    recovered = await async_test_client.get("/variant/context", params={"variant_identifier": "7:140753336:A:T"})
+
+    assert recovered.json()["pathways"] == ["R-HSA-1"]
+    assert CACHE_KEY in fake_redis.store
+
+@pytest.mark.asyncio
+async def test_batch_reads_and_fills_response_cache(async_test_client: httpx.AsyncClient, fake_redis, respx_mock):
+    """
+    Tests that a batch request serves cached variants from Redis, POSTs only the
+    misses to VEP, and caches the responses it builds.
+    """
+    get_route = respx_mock.get(VEP_URL).mock(return_value=httpx.Response(200, json=MOCK_VEP_RESPONSE))
+    respx_mock.get(REACTOME_URL).mock(return_value=httpx.Response(200, json=[{"stId": "R-HSA-1"}]))
+    other = dict(MOCK_VEP_RESPONSE[0], input="rs121913529")
+    post_route = respx_mock.post(f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs").mock(
+        return_value=httpx.Response(200, json=[other])
+    )
+
+    await async_test_client.get("/variant/context", params={"variant_identifier": "7:140753336:A:T"})
+    clear_caches()
+    response = await async_test_client.post(
+        "/variant/context/batch", json={"variant_identifiers": ["rs121913529", "chr7:140753336:A:T"]}
+    )
+
+    assert response.status_code == 200
+    assert [item["input_variant"] for item in response.json()] == ["rs121913529", "chr7:140753336:A:T"]
+    assert get_route.call_count == 1
+    assert json.loads(post_route.calls[0].request.content)["hgvs_notations"] == ["rs121913529"]
+    assert response_cache_key("rs121913529", True) in fake_redis.store
+
+@pytest.mark.asyncio
+async def test_batch_survives_cache_closing_mid_request(async_test_client: httpx.AsyncClient, fake_redis, mocker):
+    """
+    Tests that a batch still returns the variants it read from Redis if the cache is
+    closed (e.g. by shutdown) while the request is in flight.
+    """
+    fake_redis.store[response_cache_key("7:g.140753336A>T", False)] = b'{"resolved_variant":"7:g.140753336A>T","pathways":[]}'
+    other = dict(MOCK_VEP_RESPONSE[0], input="rs121913529")
+
+    async def close_cache_then_annotate(vep_api_input_ids):
+        mocker.patch("app.response_cache._redis", None)
+        return {"rs121913529": other}
+
+    mocker.patch("app.main.get_vep_annotations_batch_via_api", side_effect=close_cache_then_annotate)
+
+    response = await async_test_client.post(
+        "/variant/context/batch",
+        json={"variant_identifiers": ["7:140753336:A:T", "rs121913529"], "include_pathways": False}
+    )
+
+    assert response.status_code == 200
+    assert [item["input_variant"] for item in response.json()] == ["7:140753336:A:T", "rs121913529"]
@@ -0,0 +1,53 @@
+# tests/unit/test_consequence_selection.py
+
+import pytest
+
+from app.main import _summarize_consequences, _build_variant_context
+
+def test_summarize_consequences_selects_impact_and_alphamissense():
+    """
+    Tests that a single pass picks the highest-impact (canonical-first) consequence
+    and, independently, the most severe AlphaMissense prediction across missense transcripts.
+    """
+    consequences = [
+        {"transcript_id": "T1", "impact": "MODIFIER", "consequence_terms": ["intron_variant"]},
+        {"transcript_id": "T2", "impact": "MODERATE", "consequence_terms": ["missense_variant"],
+         "alphamissense": {"am_pathogenicity": 0.6, "am_class": "ambiguous"}},
+        {"transcript_id": "T3", "impact": "MODERATE", "canonical": 1, "consequence_terms": ["missense_variant"],
+         "alphamissense": {"am_pathogenicity": 0.9, "am_class": "likely_pathogenic"}},
+        {"transcript_id": "T4", "impact": "MODERATE", "consequence_terms": ["missense_variant"],
+         "alphamissense": {"am_pathogenicity": 0.95, "am_class": "likely_pathogenic"}},
+    ]
+
+    relevant, am_result = _summarize_consequences(consequences)
+
+    # The canonical transcript wins among equal-impact consequences.
+    assert relevant["transcript_id"] == "T3"
+    # The highest score within the most severe class is reported.
+    assert am_result == (0.95, "likely_pathogenic")
+
+def test_summarize_consequences_without_alphamissense():
+    """
+    Tests that no AlphaMissense result is returned when no missense transcript carries a score.
+    """
+    consequences = [
+        {"transcript_id": "T1", "impact": "LOW", "consequence_terms": ["synonymous_variant"],
+         "alphamissense": {"am_pathogenicity": 0.1, "am_class": "likely_benign"}},
+        {"transcript_id": "T2", "impact": "HIGH", "consequence_terms": ["stop_gained"]},
+    ]
+
+    relevant, am_result = _summarize_consequences(consequences)
+
+    assert relevant["transcript_id"] == "T2"
+    assert am_result is None
+
+@pytest.mark.asyncio
+async def test_build_variant_context_null_consequence_terms():
+    """
+    Tests that an explicit null consequence_terms from VEP yields an empty consequence instead of an error.
+    """
+    vep_response = {"input": "rs1", "transcript_consequences": [{"transcript_id": "T1", "impact": "HIGH", "consequence_terms": None}]}
+
+    context, _ = await _build_variant_context("rs1", vep_response, include_pathways=False)
+
+    assert context.consequence == ""
@@ -1,9 +1,11 @@
 # --- tests/unit/test_external_apis.py ---
 
+import asyncio
+import json
 import pytest
 import httpx
 import respx # The respx library is used to mock HTTP requests
-from app.external_apis import get_vep_annotation_via_api
+from app.external_apis import get_vep_annotation_via_api, get_vep_annotations_batch_via_api, _vep_rejections
 from app.core.config import settings
 
 # `@pytest.mark.asyncio` is from the pytest-asyncio plugin.
@@ -60,4 +62,171 @@ async def test_get_vep_annotation_bad_request(respx_mock):
     result = await get_vep_annotation_via_api("bad_input")
     
     # The function should catch the HTTPStatusError and return None.
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+@pytest.mark.asyncio
+async def test_get_vep_annotation_cached(respx_mock):
+    """
+    Tests that a repeated lookup for the same identifier is served from the cache.
+    """
+    mock_vep_response = [{"input": "rs113488022", "transcript_consequences": []}]
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs/rs113488022"
+    route = respx_mock.get(url).mock(return_value=httpx.Response(200, json=mock_vep_response))
+
+    first = await get_vep_annotation_via_api("rs113488022")
+    second = await get_vep_annotation_via_api("rs113488022")
+
+    assert first == second == mock_vep_response[0]
+    # Only the first call should have reached the network.
+    assert route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_get_vep_annotation_errors_not_cached(respx_mock):
+    """
+    Tests that a failed request is not cached, so the next call retries VEP.
+    """
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs/rs113488022"
+    route = respx_mock.get(url).mock(side_effect=[
+        httpx.Response(503),
+        httpx.Response(200, json=[{"input": "rs113488022"}]),
+    ])
+
+    assert await get_vep_annotation_via_api("rs113488022") is None
+    assert await get_vep_annotation_via_api("rs113488022") == {"input": "rs113488022"}
+    assert route.call_count == 2
+
+@pytest.mark.asyncio
+async def test_get_vep_annotation_rejection_cached(respx_mock):
+    """
+    Tests that an identifier VEP rejects with 400 is not re-queried within the negative-cache TTL.
+    """
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs/bad_input"
+    route = respx_mock.get(url).mock(return_value=httpx.Response(400, json={"error": "Bad request"}))
+
+    assert await get_vep_annotation_via_api("bad_input") is None
+    assert await get_vep_annotation_via_api("bad_input") is None
+    assert route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_get_vep_annotation_concurrent_requests_coalesced(respx_mock):
+    """
+    Tests that concurrent lookups for the same identifier share a single in-flight VEP call.
+    """
+    mock_vep_response = [{"input": "rs113488022", "transcript_consequences": []}]
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs/rs113488022"
+
+    # Hold the response open so every caller arrives while the first request is still in flight.
+    async def slow_response(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=mock_vep_response)
+
+    route = respx_mock.get(url).mock(side_effect=slow_response)
+
+    results = await asyncio.gather(*(get_vep_annotation_via_api("rs113488022") for _ in range(5)))
+
+    assert all(result == mock_vep_response[0] for result in results)
+    assert route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_get_vep_annotations_batch(respx_mock, mocker):
+    """
+    Tests that batch lookups are POSTed in chunks of VEP_BATCH_SIZE and mapped back by input.
+    """
+    mocker.patch.object(settings, "VEP_BATCH_SIZE", 2)
+
+    def echo_annotations(request):
+        notations = json.loads(request.content)["hgvs_notations"]
+        return httpx.Response(200, json=[{"input": notation} for notation in notations if notation != "rs3"])
+
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs"
+    route = respx_mock.post(url).mock(side_effect=echo_annotations)
+    get_route = respx_mock.get(f"{url}/rs3").mock(return_value=httpx.Response(200, json=[]))
+
+    result = await get_vep_annotations_batch_via_api(["rs1", "rs2", "rs3", "rs1"])
+
+    # Duplicates are sent once; three unique identifiers need two batches of two.
+    assert route.call_count == 2
+    # An identifier the batch left out is confirmed with its own GET before it is dropped.
+    assert get_route.call_count == 1
+    # Identifiers VEP did not annotate are absent from the mapping.
+    assert result == {"rs1": {"input": "rs1"}, "rs2": {"input": "rs2"}}
+
+@pytest.mark.asyncio
+async def test_get_vep_annotations_batch_error(respx_mock):
+    """
+    Tests that a failed batch call is reported as None rather than as an empty mapping.
+    """
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs"
+    respx_mock.post(url).mock(return_value=httpx.Response(503, text="Service Unavailable"))
+
+    assert await get_vep_annotations_batch_via_api(["rs1", "rs2"]) is None
+
+@pytest.mark.asyncio
+async def test_get_vep_annotations_batch_reuses_cache(respx_mock):
+    """
+    Tests that identifiers already cached by a single lookup are not POSTed again,
+    that batch results are cached for later lookups, and that the first of several
+    VEP entries for one input wins.
+    """
+    get_route = respx_mock.get(f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs/rs1").mock(
+        return_value=httpx.Response(200, json=[{"input": "rs1", "source": "get"}])
+    )
+    post_route = respx_mock.post(f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs").mock(
+        return_value=httpx.Response(200, json=[{"input": "rs2", "rank": 1}, {"input": "rs2", "rank": 2}])
+    )
+
+    await get_vep_annotation_via_api("rs1")
+    result = await get_vep_annotations_batch_via_api(["rs1", "rs2"])
+
+    assert json.loads(post_route.calls[0].request.content)["hgvs_notations"] == ["rs2"]
+    assert result == {"rs1": {"input": "rs1", "source": "get"}, "rs2": {"input": "rs2", "rank": 1}}
+
+    # The batch result now serves single lookups too.
+    assert await get_vep_annotation_via_api("rs2") == {"input": "rs2", "rank": 1}
+    assert get_route.call_count == 1
+    assert post_route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_get_vep_annotations_batch_does_not_cache_gaps(respx_mock):
+    """
+    Tests that a malformed batch payload fails the batch without caching anything,
+    so a later single lookup still queries VEP.
+    """
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs"
+    respx_mock.post(url).mock(return_value=httpx.Response(200, json={"error": "oops"}))
+    get_route = respx_mock.get(f"{url}/rs1").mock(return_value=httpx.Response(200, json=[{"input": "rs1"}]))
+
+    assert await get_vep_annotations_batch_via_api(["rs1", "rs2"]) is None
+    assert await get_vep_annotation_via_api("rs1") == {"input": "rs1"}
+    assert get_route.call_count == 1
+
+@pytest.mark.asyncio
+async def test_get_vep_annotations_batch_isolates_rejected_identifier(respx_mock):
+    """
+    Tests that a batch VEP rejects because of one bad identifier is split until that
+    identifier is isolated, so only it is dropped and remembered as rejected, and a
+    concurrent single lookup that joined the batch still gets its annotation.
+    """
+    bad_id = "1:g.5Q>Z"
+
+    # Hold each response open so the single lookup joins the batch while it is in flight.
+    async def reject_bad_id(request):
+        await asyncio.sleep(0.02)
+        notations = json.loads(request.content)["hgvs_notations"]
+        if bad_id in notations:
+            return httpx.Response(400, json={"error": "Could not parse"})
+        return httpx.Response(200, json=[{"input": notation} for notation in notations])
+
+    url = f"{settings.ENSEMBL_API_SERVER}/vep/human/hgvs"
+    post_route = respx_mock.post(url).mock(side_effect=reject_bad_id)
+    get_route = respx_mock.get(f"{url}/rs1")
+
+    batch = asyncio.create_task(get_vep_annotations_batch_via_api(["rs1", "rs2", bad_id]))
+    await asyncio.sleep(0.01)
+    single = await get_vep_annotation_via_api("rs1")
+
+    assert await batch == {"rs1": {"input": "rs1"}, "rs2": {"input": "rs2"}}
+    assert single == {"input": "rs1"}
+    assert post_route.call_count == 5
+    assert get_route.call_count == 0
+    assert list(_vep_rejections) == [bad_id]
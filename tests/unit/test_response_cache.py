@@ -0,0 +1,127 @@
+# tests/unit/test_response_cache.py
+
+import asyncio
+import json
+import pytest
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from app import response_cache
+
+class _Payload(BaseModel):
+    input_variant: str = "rs1"
+    value: int
+
+@pytest.mark.asyncio
+async def test_get_or_compute_response_caches_payload(fake_redis):
+    """
+    Tests that a miss computes and stores the payload, and a later hit skips compute().
+    """
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return _Payload(value=1), True
+
+    first = await response_cache.get_or_compute_response("vc:test", compute)
+    second = await response_cache.get_or_compute_response("vc:test", compute)
+
+    assert first == second == b'{"value":1}'
+    assert fake_redis.store["vc:test"] == b'{"value":1}'
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_get_or_compute_response_single_flight(fake_redis):
+    """
+    Tests that concurrent misses for the same key compute the payload only once.
+    """
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return _Payload(value=2), True
+
+    results = await asyncio.gather(*(response_cache.get_or_compute_response("vc:hot", compute) for _ in range(5)))
+
+    assert all(result == b'{"value":2}' for result in results)
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_get_or_compute_response_redis_error(fake_redis, mocker):
+    """
+    Tests that a Redis failure is treated as a miss rather than failing the request.
+    """
+    mocker.patch.object(fake_redis, "get", side_effect=redis.ConnectionError("Simulated outage"))
+
+    async def compute():
+        return _Payload(value=3), True
+
+    assert await response_cache.get_or_compute_response("vc:down", compute) == b'{"value":3}'
+
+@pytest.mark.asyncio
+async def test_get_or_compute_response_waiters_keep_lock_after_failure(fake_redis):
+    """
+    Tests that when compute() fails, queued waiters and newly arriving requests still
+    share one lock, so only one of them computes at a time.
+    """
+    running = 0
+    max_running = 0
+
+    async def failing_compute():
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        raise LookupError("not found")
+
+    async def call():
+        with pytest.raises(LookupError):
+            await response_cache.get_or_compute_response("vc:missing", failing_compute)
+
+    first_wave = [asyncio.create_task(call()) for _ in range(3)]
+    await asyncio.sleep(0.015)
+    # Arrives after the first holder released the lock while the others are still queued.
+    late = asyncio.create_task(call())
+    await asyncio.gather(*first_wave, late)
+
+    assert max_running == 1
+    assert "vc:missing" not in response_cache._locks
+
+@pytest.mark.asyncio
+async def test_get_or_compute_response_skips_incomplete(fake_redis):
+    """
+    Tests that a response marked incomplete is returned but not stored.
+    """
+    async def compute():
+        return _Payload(value=5), False
+
+    assert await response_cache.get_or_compute_response("vc:degraded", compute) == b'{"value":5}'
+    assert "vc:degraded" not in fake_redis.store
+
+def test_with_input_variant_splices_field():
+    """
+    Tests that input_variant is excluded from cached payloads and spliced back in as valid JSON.
+    """
+    payload = response_cache.dump_response(_Payload(input_variant="rs1", value=4))
+
+    assert payload == b'{"value":4}'
+    assert json.loads(response_cache.with_input_variant(payload, 'chr7:1:"a":t')) == {"input_variant": 'chr7:1:"a":t', "value": 4}
+
+@pytest.mark.asyncio
+async def test_clear_response_cache_unlinks_in_chunks(fake_redis, mocker):
+    """
+    Tests that clearing removes only response keys, in UNLINK calls of bounded size.
+    """
+    mocker.patch.object(response_cache, "_CLEAR_CHUNK_SIZE", 2)
+    fake_redis.store.update({f"vc:test:{i}": b"{}" for i in range(5)})
+    fake_redis.store["other:key"] = b"{}"
+    unlink = mocker.spy(fake_redis, "unlink")
+
+    await response_cache.clear_response_cache()
+
+    assert fake_redis.store == {"other:key": b"{}"}
+    assert [len(call.args) for call in unlink.call_args_list] == [2, 2, 1]
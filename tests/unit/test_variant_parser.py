@@ -31,6 +31,19 @@ from app.variant_parser import normalize_variant_for_vep
     ("7:not_a_number:A:T", None),
     # Test case 11: Empty string input
     ("", None),
+    # Test case 12: Lower-case alleles and spaces around separators are normalized
+    ("chr7 : 140753336 : a : t", "7:g.140753336A>T"),
+    # Test case 13: chr-prefixed chr:posREF>ALT format
+    ("chrX:100C>G", "X:g.100C>G"),
+    # Test case 14: Non-nucleotide alleles are rejected
+    ("7:140753336:1:2", None),
+    ("1:5:Q:Z", None),
+    ("12:25245350E>F", None),
+    # Test case 15: Whitespace between position and alleles in chr:posREF>ALT format
+    ("7:140753336 A>T", "7:g.140753336A>T"),
+    ("7: 1 A > T", "7:g.1A>T"),
+    # Test case 16: Non-ASCII digits are rejected rather than passed on to VEP
+    ("7:\uff11:A:T", None),
 ])
 def test_normalize_variant_for_vep(input_str, expected_output):
     """